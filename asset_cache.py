@@ -0,0 +1,114 @@
+# asset_cache.py
+# In-memory cache for the static front-end assets (index.html, static/*).
+# Files are read from disk once, then served from memory with an ETag and an
+# optional pre-compressed gzip body, so page loads and health checks on "/"
+# cost no disk I/O.
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Bodies smaller than this are not worth compressing.
+MIN_GZIP_SIZE = 512
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Parses an Accept-Encoding header; gzip (or *) is accepted only with a non-zero q-value."""
+    gzip_q: Optional[float] = None
+    wildcard_q: Optional[float] = None
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try: q = float(value.strip())
+                except ValueError: q = 0.0
+        if coding == "gzip": gzip_q = q
+        elif coding == "*": wildcard_q = q
+    if gzip_q is not None: return gzip_q > 0
+    return wildcard_q is not None and wildcard_q > 0
+
+
+class CachedAsset:
+    """
+    A single file held in memory along with its gzip-encoded body.
+    Each content coding gets its own strong ETag (the gzip one carries a "-gzip" suffix).
+    """
+
+    def __init__(self, path: str, content: bytes, media_type: str):
+        self.path = path
+        self.content = content
+        self.media_type = media_type
+        digest = hashlib.sha1(content).hexdigest()
+        self.etag = '"' + digest + '"'
+        self.gzip_etag = '"' + digest + '-gzip"'
+        self.gzip_content: Optional[bytes] = None
+        if len(content) >= MIN_GZIP_SIZE:
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) < len(content):
+                self.gzip_content = compressed
+
+    def response(self, request: Request, status_code: int = 200) -> Response:
+        """Builds a response honouring If-None-Match and Accept-Encoding."""
+        use_gzip = self.gzip_content is not None and accepts_gzip(request.headers.get("accept-encoding", ""))
+        etag = self.gzip_etag if use_gzip else self.etag
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        # If-None-Match uses weak comparison, so a W/ prefix on the client's tag is ignored.
+        client_tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in client_tags or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+        body = self.content
+        if use_gzip:
+            body = self.gzip_content
+            headers["Content-Encoding"] = "gzip"
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=status_code, headers=headers, media_type=self.media_type)
+        return Response(content=body, status_code=status_code, headers=headers, media_type=self.media_type)
+
+
+class AssetCache:
+    """
+    Lazily loads files beneath a root directory into memory.
+    Paths are resolved against the root and anything escaping it is rejected.
+    Missing files are not cached, so a file added later is still picked up.
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.realpath(root_dir)
+        self._assets: Dict[str, CachedAsset] = {}
+
+    def _resolve(self, relative_path: str) -> Optional[str]:
+        full_path = os.path.realpath(os.path.join(self.root_dir, relative_path))
+        if full_path != self.root_dir and not full_path.startswith(self.root_dir + os.sep):
+            return None
+        return full_path
+
+    def get(self, relative_path: str) -> Optional[CachedAsset]:
+        """Returns the cached asset for a path, loading it on first use. None if not found."""
+        full_path = self._resolve(relative_path)
+        if full_path is None:
+            return None
+        asset = self._assets.get(full_path)
+        if asset is not None:
+            return asset
+        if not os.path.isfile(full_path):
+            return None
+        with open(full_path, "rb") as f:
+            content = f.read()
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        asset = CachedAsset(full_path, content, media_type)
+        self._assets[full_path] = asset
+        return asset
+
+    def clear(self):
+        """Drops every cached asset (e.g. after deploying new front-end files)."""
+        self._assets.clear()
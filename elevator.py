@@ -38,6 +38,10 @@ class Elevator:
         self.stops_requested: Dict[int, Set[int]] = defaultdict(set)
         self.stopped_this_step = False
         self.moved_this_step = False
+        # Memoized display strings. Each entry is keyed on the render version (bumped whenever
+        # passengers or stop requests change) plus whatever else that render depends on.
+        self._render_version = 0
+        self._render_cache: Dict[str, Tuple[Tuple, Any]] = {}
         print(f"Elevator initialized at floor {self._display_floor(self.current_floor)} "
               f"in building {self._display_floor(lowest_floor)}..{self._display_floor(highest_floor)} "
               f"(Cap: {self.capacity}).")
@@ -50,6 +54,20 @@ class Elevator:
         else:
             return str(floor_num)
 
+    def _invalidate_render_cache(self):
+        """Marks memoized display strings as stale after passengers or stops change."""
+        self._render_version += 1
+
+    def _cached_render(self, name, render_func, *depends_on):
+        """Returns a memoized display value, re-rendering only when the version or depends_on change."""
+        key = (self._render_version,) + depends_on
+        cached = self._render_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = render_func()
+        self._render_cache[name] = (key, value)
+        return value
+
     @property
     def current_load(self):
         """Returns the number of passengers currently in the elevator."""
@@ -74,12 +92,28 @@ class Elevator:
         dir_str = 'up' if call_direction == 1 else 'down'
         print(f"  LOG: External request added for floor {self._display_floor(pickup_floor)} (Direction: {dir_str}).")
         self.stops_requested[pickup_floor].add(call_direction)
+        self._invalidate_render_cache()
 
         if self.direction == 0:
              self.direction = call_direction
              print(f"  LOG: Elevator idle at {self._display_floor(self.current_floor)}. Direction set to {dir_str} based on call direction parameter ({call_direction}).")
 
 
+    def cancel_external_request(self, pickup_floor: int, call_direction: int):
+        """
+        Withdraws a call for one direction at a floor (e.g. after its waiting passengers were dropped).
+        The floor is removed from the stops entirely unless a rider still needs it.
+        """
+        directions = self.stops_requested.get(pickup_floor)
+        if directions is None or call_direction not in directions: return
+        directions.discard(call_direction)
+        if not directions and pickup_floor not in self.passenger_destinations:
+            del self.stops_requested[pickup_floor]
+        self._invalidate_render_cache()
+        dir_str = 'up' if call_direction == 1 else 'down'
+        print(f"  LOG: External request withdrawn for floor {self._display_floor(pickup_floor)} (Direction: {dir_str}).")
+
+
     def board_passenger(self, destination_floor):
         """
         Attempts to board a single passenger going to a specific destination.
@@ -98,6 +132,7 @@ class Elevator:
             # Ensure the destination floor exists as a key in stops_requested for pathfinding logic
             if destination_floor not in self.stops_requested:
                  self.stops_requested[destination_floor] = set()
+            self._invalidate_render_cache()
             print(f"  LOG: Passenger boarded for floor {self._display_floor(destination_floor)}. Load: {self.current_load}/{self.capacity}.")
             return True
         else:
@@ -110,10 +145,14 @@ class Elevator:
         passengers_alighting = self.passenger_destinations.count(self.current_floor)
         if passengers_alighting > 0:
             self.passenger_destinations = [dest for dest in self.passenger_destinations if dest != self.current_floor]
+            self._invalidate_render_cache()
         return passengers_alighting
 
     def _sorted_stops_display(self):
-        """Helper for display, sorting requested stops numerically for readability."""
+        """Helper for display, sorting requested stops numerically for readability. Memoized."""
+        return self._cached_render("stops", self._render_sorted_stops)
+
+    def _render_sorted_stops(self):
         if not self.stops_requested: return "None"
         floors_with_requests = list(self.stops_requested.keys())
         if not floors_with_requests: return "None"
@@ -121,7 +160,10 @@ class Elevator:
                       key=lambda x: 0 if x == 'G' else int(x))
 
     def _passenger_dest_summary(self):
-        """ Summarizes passenger destinations concisely. """
+        """ Summarizes passenger destinations concisely. Memoized. """
+        return self._cached_render("dest_summary", self._render_dest_summary, self.current_floor, self.direction)
+
+    def _render_dest_summary(self):
         if not self.passenger_destinations: return "Empty"
         counts = Counter(self.passenger_destinations)
         sorted_floors = sorted(counts.keys())
@@ -135,6 +177,52 @@ class Elevator:
         return ", ".join(summary_parts) if summary_parts else "Empty"
 
 
+    def reconfigure(self, lowest_floor, highest_floor, capacity) -> bool:
+        """
+        Applies a new floor range and capacity in place, keeping position, direction and riders.
+        Stop requests outside the new range are dropped. Returns False (nothing changed) if the
+        car or any rider destination would fall outside the new range.
+        """
+        if not isinstance(lowest_floor, int) or not isinstance(highest_floor, int) or lowest_floor > highest_floor:
+            raise ValueError("Invalid floor range for reconfiguration.")
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError("Capacity must be a positive integer.")
+        if not lowest_floor <= self.current_floor <= highest_floor:
+            return False
+        if any(not lowest_floor <= dest <= highest_floor for dest in self.passenger_destinations):
+            return False
+        self.lowest_floor = lowest_floor
+        self.highest_floor = highest_floor
+        # Riders above a reduced capacity stay aboard; boarding resumes once the load drops below it.
+        self.capacity = capacity
+        for floor in [f for f in self.stops_requested if not lowest_floor <= f <= highest_floor]:
+            del self.stops_requested[floor]
+        self._invalidate_render_cache()
+        print(f"Elevator reconfigured in place: building {self._display_floor(lowest_floor)}..{self._display_floor(highest_floor)} "
+              f"(Cap: {self.capacity}, Load: {self.current_load}).")
+        return True
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Returns a compact, JSON-serializable snapshot of the elevator state (used for hibernation)."""
+        return {
+            "lowest_floor": self.lowest_floor, "highest_floor": self.highest_floor,
+            "capacity": self.capacity, "current_floor": self.current_floor, "direction": self.direction,
+            "passenger_destinations": list(self.passenger_destinations),
+            "stops_requested": [[floor, sorted(dirs)] for floor, dirs in self.stops_requested.items()],
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "Elevator":
+        """Rebuilds an elevator from a snapshot created by to_snapshot()."""
+        restored = cls(snapshot["lowest_floor"], snapshot["highest_floor"], snapshot["capacity"], snapshot["current_floor"])
+        restored.direction = snapshot["direction"]
+        restored.passenger_destinations = list(snapshot["passenger_destinations"])
+        for floor, dirs in snapshot["stops_requested"]:
+            restored.stops_requested[floor] = set(dirs)
+        restored._invalidate_render_cache()
+        return restored
+
+
     # *** FIXED: Define internal_dests_str ***
     def status(self):
         """Returns a string describing the current state of the elevator."""
@@ -224,6 +312,7 @@ class Elevator:
             # Remove the floor entry from stops_requested dictionary after stopping.
             if self.current_floor in self.stops_requested:
                  del self.stops_requested[self.current_floor]
+                 self._invalidate_render_cache()
                  print(f"  LOG: Stop request entry for {self._display_floor(self.current_floor)} removed by elevator logic. Remaining stops: {self._sorted_stops_display()}")
 
         # --- 2. Determine movement logic (only if not stopped this step) ---
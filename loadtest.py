@@ -0,0 +1,343 @@
+# loadtest.py
+# Load-testing harness for the /ws endpoint of main:app.
+# Opens N local WebSocket connections, performs the "configure" handshake on each,
+# then sends "call"/"ping" traffic at configurable rates while measuring
+# broadcast receive latency, tick jitter and dropped frames.
+# Writes a JSON report that can be compared across commits (--compare).
+#
+# Usage:
+#   python loadtest.py --spawn-server --connections 200 --duration 60 --output report.json
+#   python loadtest.py --url ws://127.0.0.1:5050/ws --compare baseline.json
+#
+# Only local servers are accepted: latency is measured against the server's own
+# clock (the "server_time" field of each broadcast), which requires the same host.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+import websockets
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("loadtest")
+
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+HANDSHAKE_TIMEOUT = 45.0 # Matches the server's wait for the configure message
+REPORT_VERSION = 1
+REPO_DIR = os.path.dirname(os.path.abspath(__file__)) # main.py lives next to this script
+# Config keys that must match for two reports to be comparable (the URL/port may differ).
+COMPARABLE_CONFIG_KEYS = ["connections", "duration", "ramp", "warmup", "call_rate", "ping_rate",
+                          "cycle_time", "min_floor", "max_floor", "capacity", "seed"]
+
+
+class ConnectionStats:
+    """Per-connection measurements, collected only inside the measurement window."""
+
+    def __init__(self):
+        self.handshake_time: Optional[float] = None
+        self.latencies: List[float] = []
+        self.tick_intervals: List[float] = []
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.calls_sent = 0
+        self.pings_sent = 0
+        self.server_errors = 0
+        self.failed: Optional[str] = None
+        self._last_tick: Optional[int] = None
+        self._last_server_time: Optional[float] = None
+
+    def on_state(self, state: Dict[str, Any], received_at: float, measuring: bool):
+        tick = state.get("tick"); server_time = state.get("server_time")
+        if not isinstance(tick, int) or not isinstance(server_time, (int, float)): return
+        if self._last_tick is not None and tick <= self._last_tick: return # Re-broadcast after configure, not a new tick
+        if measuring:
+            self.frames_received += 1
+            self.latencies.append(received_at - server_time)
+            if self._last_tick is not None:
+                gap = tick - self._last_tick
+                self.frames_dropped += gap - 1
+                if gap == 1: self.tick_intervals.append(server_time - self._last_server_time)
+        self._last_tick = tick; self._last_server_time = server_time
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values: return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(values: List[float], scale: float = 1000.0) -> Dict[str, Optional[float]]:
+    """ Returns count/mean/p50/p95/p99/max, scaled (default: seconds -> milliseconds). """
+    if not values: return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(values), "mean": sum(values) / len(values) * scale,
+        "p50": percentile(values, 50) * scale, "p95": percentile(values, 95) * scale,
+        "p99": percentile(values, 99) * scale, "max": max(values) * scale,
+    }
+
+
+async def run_connection(index: int, args: argparse.Namespace, state: Dict[str, Any], stats: ConnectionStats,
+                         reset: bool = False, handshake_done: Optional[asyncio.Event] = None):
+    """
+    Opens one connection, configures, then sends traffic and records broadcasts until the test ends.
+    With reset=True the configure asks the server for a fresh run instead of reconfiguring the live one.
+    handshake_done (if given) is set once the handshake has completed or failed.
+    """
+    rng = random.Random(args.seed + index)
+    configure = {"type": "configure", "min_floor": args.min_floor, "max_floor": args.max_floor,
+                 "capacity": args.capacity, "start_floor": args.min_floor, "cycle_time": args.cycle_time}
+    if reset: configure["reset"] = True
+    try:
+        started = time.monotonic()
+        async with websockets.connect(args.url, open_timeout=HANDSHAKE_TIMEOUT, max_size=None) as ws:
+            await ws.send(json.dumps(configure))
+            # The handshake completes when the first state broadcast arrives.
+            while True:
+                message = json.loads(await asyncio.wait_for(ws.recv(), timeout=HANDSHAKE_TIMEOUT))
+                if message.get("type") == "error": raise RuntimeError(f"Configure rejected: {message.get('message')}")
+                if "current_floor" in message: break
+            stats.handshake_time = time.monotonic() - started
+            if handshake_done is not None: handshake_done.set()
+
+            async def receiver():
+                try:
+                    async for raw in ws:
+                        received_at = time.time()
+                        message = json.loads(raw)
+                        if message.get("type") == "error": stats.server_errors += 1
+                        elif "current_floor" in message: stats.on_state(message, received_at, state["measuring"])
+                except websockets.ConnectionClosed: pass
+                # Ticks missed after an early close are not counted as dropped frames, so report the connection as failed.
+                if not state["stop"].is_set():
+                    close_code = ws.close_code if ws.close_code is not None else "none"
+                    stats.failed = f"Connection closed by server before the test ended (code {close_code})"
+                    logger.warning(f"Connection {index} failed: {stats.failed}")
+
+            async def sender(rate: float, build_message, counter: str):
+                if rate <= 0: return
+                while not state["stop"].is_set():
+                    await asyncio.sleep(rng.expovariate(rate)) # Poisson arrivals
+                    if state["stop"].is_set(): break
+                    await ws.send(json.dumps(build_message()))
+                    if state["measuring"]: setattr(stats, counter, getattr(stats, counter) + 1)
+
+            def build_call():
+                floor = rng.randint(args.min_floor, args.max_floor)
+                dest = rng.choice([f for f in range(args.min_floor, args.max_floor + 1) if f != floor])
+                return {"type": "call", "floor": floor, "destination": dest, "num_passengers": rng.randint(1, args.capacity)}
+
+            def build_ping():
+                return {"type": "ping", "floor": rng.randint(args.min_floor, args.max_floor), "direction": rng.choice(["up", "down"])}
+
+            receive_task = asyncio.create_task(receiver())
+            senders = [asyncio.create_task(sender(args.call_rate, build_call, "calls_sent")),
+                       asyncio.create_task(sender(args.ping_rate, build_ping, "pings_sent"))]
+            await state["stop"].wait()
+            for task in senders + [receive_task]: task.cancel()
+            await asyncio.gather(*senders, receive_task, return_exceptions=True)
+    except Exception as e:
+        stats.failed = f"{type(e).__name__}: {e}"
+        logger.warning(f"Connection {index} failed: {stats.failed}")
+    finally:
+        if handshake_done is not None: handshake_done.set()
+
+
+def build_report(args: argparse.Namespace, all_stats: List[ConnectionStats], measured_seconds: float) -> Dict[str, Any]:
+    ok = [s for s in all_stats if s.failed is None and s.handshake_time is not None]
+    frames_received = sum(s.frames_received for s in ok); frames_dropped = sum(s.frames_dropped for s in ok)
+    tick_intervals = [t for s in ok for t in s.tick_intervals]
+    commit, dirty = git_commit()
+    return {
+        "version": REPORT_VERSION,
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": report_config(args),
+        "connections": {"opened": len(ok), "failed": len(all_stats) - len(ok),
+                        "failures": sorted({s.failed for s in all_stats if s.failed})[:10]},
+        "handshake_ms": summarize([s.handshake_time for s in ok]),
+        "latency_ms": summarize([l for s in ok for l in s.latencies]),
+        "tick_jitter_ms": summarize([abs(t - args.cycle_time) for t in tick_intervals]),
+        "frames": {"received": frames_received, "dropped": frames_dropped,
+                   "drop_rate": frames_dropped / (frames_received + frames_dropped) if frames_received + frames_dropped else 0.0},
+        "traffic": {"calls_sent": sum(s.calls_sent for s in ok), "pings_sent": sum(s.pings_sent for s in ok),
+                    "server_errors": sum(s.server_errors for s in ok), "measured_seconds": measured_seconds},
+    }
+
+
+def report_config(args: argparse.Namespace) -> Dict[str, Any]:
+    config = {"url": args.url}
+    config.update({key: getattr(args, key) for key in COMPARABLE_CONFIG_KEYS})
+    return config
+
+
+def config_differences(config: Dict[str, Any], baseline_config: Dict[str, Any]) -> List[str]:
+    """ Lists the comparable settings that differ between two reports. """
+    return [f"{key}: {baseline_config.get(key)!r} -> {config.get(key)!r}"
+            for key in COMPARABLE_CONFIG_KEYS if config.get(key) != baseline_config.get(key)]
+
+
+def git_commit() -> Tuple[Optional[str], Optional[bool]]:
+    """ Returns (short commit, dirty working tree) of the repository this script lives in. """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError): return None, None
+
+
+# (section, key) rows shown in the summary and comparison tables
+REPORT_ROWS = [
+    ("connections", "opened"), ("connections", "failed"),
+    ("handshake_ms", "p95"), ("latency_ms", "p50"), ("latency_ms", "p95"),
+    ("latency_ms", "p99"), ("latency_ms", "max"), ("tick_jitter_ms", "p95"),
+    ("tick_jitter_ms", "max"), ("frames", "received"), ("frames", "dropped"),
+    ("frames", "drop_rate"), ("traffic", "server_errors"),
+]
+
+
+def _fmt(value) -> str:
+    if value is None: return "-"
+    if isinstance(value, float): return f"{value:.3f}"
+    return str(value)
+
+
+def _describe_commit(report: Dict[str, Any]) -> str:
+    commit = report.get("commit") or "unknown commit"
+    return commit + " (dirty)" if report.get("dirty") else commit
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    header = f"{'metric':<26}{'current':>14}"
+    if baseline: header += f"{'baseline':>14}{'delta':>14}"
+    print(f"\nLoad test @ {_describe_commit(report)}" + (f" vs {_describe_commit(baseline)}" if baseline else ""))
+    if baseline:
+        differences = config_differences(report.get("config", {}), baseline.get("config", {}))
+        if differences: print("WARNING: reports used different settings; deltas are not comparable:\n  " + "\n  ".join(differences))
+    print(header); print("-" * len(header))
+    for section, key in REPORT_ROWS:
+        current = report.get(section, {}).get(key)
+        line = f"{section + '.' + key:<26}{_fmt(current):>14}"
+        if baseline:
+            previous = baseline.get(section, {}).get(key)
+            delta = current - previous if isinstance(current, (int, float)) and isinstance(previous, (int, float)) else None
+            line += f"{_fmt(previous):>14}{_fmt(delta):>14}"
+        print(line)
+
+
+def wait_for_port(host: str, port: int, timeout: float, process: Optional[subprocess.Popen] = None) -> bool:
+    """ Waits until the port accepts connections; gives up early if process exits. """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None: return False
+        try:
+            with socket.create_connection((host, port), timeout=0.5): return True
+        except OSError: time.sleep(0.2)
+    return False
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    state = {"measuring": False, "stop": asyncio.Event()}
+    all_stats = [ConnectionStats() for _ in range(args.connections)]
+    # Connection 0 resets the simulation so every run starts from the same fresh state (a live session would
+    # otherwise be reconfigured in place, keeping its passengers); the rest connect once that has completed.
+    reset_done = asyncio.Event()
+    tasks = [asyncio.create_task(run_connection(0, args, state, all_stats[0], reset=True, handshake_done=reset_done))]
+    await reset_done.wait()
+    if all_stats[0].failed: logger.warning("Reset connection failed; the simulation may not start from a fresh state.")
+    logger.info(f"Opening {args.connections} connections to {args.url} over {args.ramp}s...")
+    for i, stats in enumerate(all_stats[1:], start=1):
+        if args.ramp > 0: await asyncio.sleep(args.ramp / args.connections)
+        tasks.append(asyncio.create_task(run_connection(i, args, state, stats)))
+    # Later configures reconfigure the live simulation, so only measure once every client has connected and settled.
+    await asyncio.sleep(args.warmup)
+    logger.info(f"Measuring for {args.duration}s...")
+    state["measuring"] = True; measure_start = time.monotonic()
+    await asyncio.sleep(args.duration)
+    state["measuring"] = False; measured_seconds = time.monotonic() - measure_start
+    state["stop"].set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return build_report(args, all_stats, measured_seconds)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the /ws endpoint of a local elevator simulation server.")
+    parser.add_argument("--url", default="ws://127.0.0.1:8765/ws", help="WebSocket URL of a local server")
+    parser.add_argument("--spawn-server", action="store_true", help="Start 'uvicorn main:app' on the URL's port for the duration of the test")
+    parser.add_argument("--connections", type=int, default=50, help="Number of concurrent WebSocket clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measurement window in seconds")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which connections are opened")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds to wait after ramp-up before measuring")
+    parser.add_argument("--call-rate", type=float, default=0.2, help="'call' messages per second per connection")
+    parser.add_argument("--ping-rate", type=float, default=0.1, help="'ping' messages per second per connection")
+    parser.add_argument("--cycle-time", type=float, default=1.0, help="Simulation cycle time sent in configure (1.0-10.0)")
+    parser.add_argument("--min-floor", type=int, default=-1)
+    parser.add_argument("--max-floor", type=int, default=5)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against (its settings must match)")
+    parser.add_argument("--force-compare", action="store_true", help="Compare even if the baseline used different settings")
+    args = parser.parse_args(argv)
+    host = urlparse(args.url).hostname
+    if host not in LOCAL_HOSTS: parser.error(f"Refusing to load-test non-local host '{host}'.")
+    if args.connections < 1: parser.error("--connections must be at least 1.")
+    if not 1.0 <= args.cycle_time <= 10.0: parser.error("--cycle-time must be between 1.0 and 10.0.")
+    if args.min_floor >= args.max_floor: parser.error("--min-floor must be below --max-floor.")
+    args.baseline = None
+    if args.compare:
+        try:
+            with open(args.compare) as f: args.baseline = json.load(f)
+        except OSError as e: parser.error(f"Cannot read --compare file: {e}")
+        except json.JSONDecodeError as e: parser.error(f"--compare file {args.compare} is not valid JSON: {e}")
+        if not isinstance(args.baseline, dict) or not isinstance(args.baseline.get("config", {}), dict):
+            parser.error(f"--compare file {args.compare} is not a load test report.")
+        differences = config_differences(report_config(args), args.baseline.get("config", {}))
+        if differences and not args.force_compare:
+            parser.error("Baseline report used different settings (use --force-compare to compare anyway):\n  " + "\n  ".join(differences))
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    server = None
+    if args.spawn_server:
+        parsed = urlparse(args.url); port = parsed.port or 80
+        # stderr goes to a temp file (not a pipe, which could fill up and block the server) so startup errors can be shown.
+        server_stderr = tempfile.TemporaryFile(mode="w+")
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", parsed.hostname, "--port", str(port), "--log-level", "warning"],
+                                  cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=server_stderr)
+        if not wait_for_port(parsed.hostname, port, timeout=15.0, process=server):
+            server.terminate()
+            try: server.wait(timeout=5.0)
+            except subprocess.TimeoutExpired: server.kill()
+            server_stderr.seek(0)
+            logger.error(f"Spawned server did not start listening. Server stderr:\n{server_stderr.read()[-4000:]}")
+            return 1
+    try:
+        report = asyncio.run(run_load_test(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            try: server.wait(timeout=5.0)
+            except subprocess.TimeoutExpired: server.kill()
+    print_report(report, args.baseline)
+    if args.output:
+        with open(args.output, "w") as f: json.dump(report, f, indent=2)
+        logger.info(f"Report written to {args.output}")
+    return 0 if report["connections"]["opened"] > 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,16 +6,18 @@ import logging
 from collections import defaultdict
 from typing import List, Set, Dict, Any, Optional, Tuple
 import os # Import os module
+import time
+import gc
+import zlib
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from starlette.websockets import WebSocketState
-# *** NEW: Imports for static files and HTML response ***
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-# *** End New Imports ***
+from fastapi.responses import HTMLResponse, Response
 
 # Assuming elevator.py is in the same directory
 from elevator import Elevator # Use the latest elevator.py
+from asset_cache import AssetCache
+from recorder import SessionRecorder, SESSION_DIR_PREFIX, prune_sessions
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +29,16 @@ DEFAULT_HIGHEST_FLOOR = 5
 DEFAULT_CAPACITY = 8
 DEFAULT_START_FLOOR = 0
 DEFAULT_CYCLE_TIME = 3.0
+# Optional session recording: set ELEVATOR_RECORDING_DIR to record every tick to compressed chunk files.
+RECORDING_DIR = os.environ.get("ELEVATOR_RECORDING_DIR")
+HISTORY_MAX_POINTS = 2000 # Upper bound on rows returned by one history query
+RECORDING_MAX_SESSIONS = 50 # Session directories kept under RECORDING_DIR; oldest are deleted first
+RECORDING_MAX_BYTES = 512 * 1024 * 1024 # Total size kept under RECORDING_DIR
+# Lifecycle: with no subscribers the loop stops ticking, then hibernates after this many seconds.
+IDLE_HIBERNATE_TIMEOUT = 60.0
+MAX_WAITING_GROUPS_PER_QUEUE = 100 # Cap on waiting groups per floor and direction
+MAX_WAITING_GROUPS_TOTAL = 1000 # Cap on waiting groups across all floors
+MAX_FLOOR_SPAN = 200 # Maximum number of floors (max_floor - min_floor + 1) accepted in configure
 
 # --- Global State ---
 elevator: Optional[Elevator] = None
@@ -34,6 +46,13 @@ waiting_passengers: Dict[int, Dict[str, List[tuple[int, int]]]] = defaultdict(la
 active_connections: Set[WebSocket] = set()
 current_simulation_task: Optional[asyncio.Task] = None
 current_cycle_time = DEFAULT_CYCLE_TIME
+session_recorder: Optional[SessionRecorder] = None
+recording_session_count = 0
+subscribers_present = asyncio.Event() # Set while at least one client is connected
+hibernated_session: Optional[bytes] = None # Compressed snapshot of an idle session
+cycle_time_changed = asyncio.Event() # Wakes the loop's inter-tick sleep when the cycle time is changed live
+applied_start_floor: Optional[int] = None # start_floor the current run was built with (a configure naming another one restarts it)
+simulation_tick = 0 # Monotonic tick counter, broadcast with each state (dropped-frame detection) and used as the recorder's tick
 
 reconfig_lock = asyncio.Lock()
 sim_state_lock = asyncio.Lock()
@@ -64,7 +83,7 @@ async def _attempt_board_direction(current_floor: int, direction_key: str) -> bo
                 dest, num_waiting = current_waiting_list[i]
                 remaining_capacity = elevator.capacity - elevator.current_load
                 logger.info(f"BOARDING: Checking group {i+1}: {num_waiting}p for {elevator._display_floor(dest)}. Elevator State: Cap={elevator.capacity}, Load={elevator.current_load}, Space={remaining_capacity}")
-                if remaining_capacity == 0:
+                if remaining_capacity <= 0:
                     logger.info("BOARDING: Elevator full. Group waits.")
                     new_waiting_list_for_dir.append((dest, num_waiting)); processed_indices.add(i); continue
                 if remaining_capacity >= num_waiting:
@@ -210,6 +229,7 @@ async def broadcast_state():
     async with sim_state_lock:
          if elevator is not None:
               current_state_data = get_current_state()
+              current_state_data["tick"] = simulation_tick; current_state_data["server_time"] = time.time()
     if active_connections and current_state_data is not None:
         state_json = json.dumps(current_state_data)
         results = await asyncio.gather( *[conn.send_text(state_json) for conn in active_connections if conn.client_state == WebSocketState.CONNECTED], return_exceptions=True )
@@ -217,10 +237,162 @@ async def broadcast_state():
             if isinstance(result, Exception): logger.warning(f"BROADCAST: Error sending state: {result}")
 
 
+# --- Session Recording ---
+def recording_config() -> Dict[str, Any]:
+    """ The configuration stored in a recording's meta.json (and in each live config change). """
+    return {"lowest_floor": elevator.lowest_floor, "highest_floor": elevator.highest_floor, "capacity": elevator.capacity,
+            "cycle_time": current_cycle_time, "current_floor": elevator.current_floor}
+
+def start_recording_session():
+    """ Closes any previous recording and, if RECORDING_DIR is set, starts a new one. Assumes sim_state_lock is held. """
+    global session_recorder, recording_session_count
+    stop_recording_session()
+    if not RECORDING_DIR: return
+    recording_session_count += 1
+    session_dir = os.path.join(RECORDING_DIR, f"{SESSION_DIR_PREFIX}{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{recording_session_count}")
+    try:
+        meta = recording_config() if elevator is not None else {}
+        meta.update({"start_tick": simulation_tick, "pid": os.getpid()})
+        session_recorder = SessionRecorder(session_dir, meta=meta)
+        logger.info(f"RECORDER: Recording session to {session_dir}")
+    except OSError as e:
+        logger.error(f"RECORDER: Could not start recording in {session_dir}: {e}")
+        return
+    # Bound disk use across sessions: every restart, wake or configure creates a new directory.
+    removed = prune_sessions(RECORDING_DIR, session_dir, RECORDING_MAX_SESSIONS, RECORDING_MAX_BYTES)
+    if removed: logger.info(f"RECORDER: Removed {removed} old session recording(s).")
+
+def stop_recording_session():
+    global session_recorder
+    if session_recorder is not None:
+        session_recorder.close()
+        logger.info(f"RECORDER: Closed recording {session_recorder.directory} ({session_recorder.total_rows} ticks)")
+    session_recorder = None
+
+async def get_history(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Answers a 'history' query with a (downsampled) range of recorded ticks.
+    Chunk decoding runs in a worker thread without sim_state_lock, so ticks and broadcasts are not stalled.
+    """
+    recorder = session_recorder
+    if recorder is None: return {"type": "history", "error": "Recording is not enabled."}
+    start_tick = message.get("start_tick", 0); end_tick = message.get("end_tick"); max_points = message.get("max_points", HISTORY_MAX_POINTS)
+    if not isinstance(start_tick, int) or (end_tick is not None and not isinstance(end_tick, int)) or not isinstance(max_points, int) or max_points < 1:
+        return {"type": "history", "error": "Invalid history query."}
+    result = await asyncio.to_thread(recorder.query, start_tick, end_tick, min(max_points, HISTORY_MAX_POINTS))
+    result["type"] = "history"; result["first_tick"] = recorder.first_tick; result["latest_tick"] = recorder.next_tick - 1
+    return result
+
+
+# --- Idle Session Lifecycle ---
+def add_connection(websocket: WebSocket):
+    active_connections.add(websocket)
+    subscribers_present.set()
+
+def remove_connection(websocket: WebSocket):
+    active_connections.discard(websocket)
+    if not active_connections: subscribers_present.clear()
+
+def hibernate_session() -> bool:
+    """ Serializes the idle session to a compressed snapshot and frees the live state. Assumes sim_state_lock is held. """
+    global elevator, waiting_passengers, hibernated_session, pending_decision_details, user_decision_num_to_board
+    if elevator is None or active_connections: return False
+    snapshot = {
+        "elevator": elevator.to_snapshot(), "cycle_time": current_cycle_time,
+        "waiting_passengers": [[floor, direction, [list(group) for group in groups]] for floor, directions in waiting_passengers.items() for direction, groups in directions.items() if groups],
+    }
+    hibernated_session = zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+    stop_recording_session()
+    elevator = None; waiting_passengers = defaultdict(lambda: defaultdict(list))
+    pending_decision_details = None; decision_received_event.clear(); user_decision_num_to_board = 0
+    gc.collect()
+    logger.info(f"LIFECYCLE: Session hibernated ({len(hibernated_session)} bytes).")
+    return True
+
+def wake_hibernated_session(min_f: int, max_f: int, cap: int, cycle_t: float) -> bool:
+    """
+    Restores the hibernated session and migrates it to the requested configuration, as a live reconfigure would.
+    The snapshot is discarded only if the car state cannot be migrated. Assumes sim_state_lock is held.
+    """
+    global elevator, waiting_passengers, hibernated_session, current_cycle_time
+    if hibernated_session is None: return False
+    snapshot = json.loads(zlib.decompress(hibernated_session).decode("utf-8"))
+    hibernated_session = None
+    elevator = Elevator.from_snapshot(snapshot["elevator"])
+    waiting_passengers = defaultdict(lambda: defaultdict(list))
+    for floor, direction, groups in snapshot["waiting_passengers"]:
+        waiting_passengers[floor][direction] = [tuple(group) for group in groups]
+    current_cycle_time = snapshot["cycle_time"]
+    if not migrate_live_state(min_f, max_f, cap, cycle_t):
+        elevator = None; waiting_passengers = defaultdict(lambda: defaultdict(list))
+        logger.info("LIFECYCLE: Hibernated session cannot be migrated to the new configuration. Discarding snapshot.")
+        return False
+    logger.info("LIFECYCLE: Hibernated session restored.")
+    return True
+
+
+# --- Hot Reconfiguration ---
+def default_start_floor(min_f: int, max_f: int) -> int:
+    """ Start floor used when a configure omits it: the car's current floor (or the default), clamped into the new range. """
+    return min(max(elevator.current_floor if elevator is not None else DEFAULT_START_FLOOR, min_f), max_f)
+
+def restart_requested(message: Dict[str, Any], start_f: int) -> bool:
+    """ True if a configure asks for a fresh run: "reset": true, or a start_floor other than the one the current run began at. """
+    return message.get("reset") is True or ("start_floor" in message and start_f != applied_start_floor)
+
+def migrate_live_state(min_f: int, max_f: int, cap: int, cycle_t: float) -> bool:
+    """
+    Moves the elevator and waiting queues to a new configuration (sim_state_lock must be held).
+    Keeps the car, riders and every waiting group whose floor and destination are still valid.
+    Returns False, leaving the state untouched, if the car position or a rider destination is outside the new range.
+    """
+    global waiting_passengers, current_cycle_time
+    if not elevator.reconfigure(min_f, max_f, cap):
+        logger.info("RECONFIG: Car position or rider destinations outside the new floor range. Full restart required.")
+        return False
+    migrated = defaultdict(lambda: defaultdict(list)); dropped_groups = 0; emptied_queues = []
+    for floor, directions in waiting_passengers.items():
+        for direction_key, groups in directions.items():
+            kept = [(dest, num) for dest, num in groups if min_f <= floor <= max_f and min_f <= dest <= max_f]
+            dropped_groups += len(groups) - len(kept)
+            if kept: migrated[floor][direction_key] = kept
+            elif groups: emptied_queues.append((floor, direction_key))
+    waiting_passengers = migrated
+    # A queue that lost all its groups no longer needs a pickup stop (out-of-range floors were already dropped).
+    for floor, direction_key in emptied_queues:
+        elevator.cancel_external_request(floor, 1 if direction_key == 'up' else -1)
+    if cycle_t != current_cycle_time:
+        current_cycle_time = cycle_t; cycle_time_changed.set()
+    if dropped_groups: logger.info(f"RECONFIG: Dropped {dropped_groups} out-of-range waiting group(s).")
+    return True
+
+def apply_hot_reconfiguration(min_f: int, max_f: int, cap: int, cycle_t: float) -> bool:
+    """
+    Reconfigures the running simulation in place at a tick boundary (sim_state_lock must be held).
+    Returns False if there is no live simulation or the car state cannot be migrated; the caller then restarts it.
+    """
+    if elevator is None or current_simulation_task is None or current_simulation_task.done(): return False
+    if not migrate_live_state(min_f, max_f, cap, cycle_t): return False
+    if session_recorder is not None:
+        try: session_recorder.record_config_change(simulation_tick, recording_config())
+        except OSError as e: logger.error(f"RECORDER: Could not record config change: {e}")
+    logger.info(f"RECONFIG: Applied in place (floors {min_f}..{max_f}, cap {cap}, cycle {cycle_t}s).")
+    return True
+
+async def wait_for_next_tick(start_time: float):
+    """ Sleeps until the next tick, re-computing the deadline if the cycle time is changed meanwhile. """
+    loop = asyncio.get_event_loop()
+    while True:
+        cycle_time_changed.clear()
+        sleep_duration = max(0.05, current_cycle_time - (loop.time() - start_time))
+        try: await asyncio.wait_for(cycle_time_changed.wait(), timeout=sleep_duration)
+        except asyncio.TimeoutError: return
+
+
 # --- Simulation Loop Task ---
 async def simulation_loop():
     """Runs the elevator simulation logic periodically, handling boarding."""
-    global elevator, current_cycle_time, pending_decision_details, decision_received_event, waiting_passengers, sim_state_lock
+    global elevator, current_cycle_time, pending_decision_details, decision_received_event, waiting_passengers, sim_state_lock, simulation_tick
     logger.info("Simulation loop task started and waiting for configuration...")
     while elevator is None: await asyncio.sleep(0.5)
     logger.info("Elevator configured. Simulation loop running.")
@@ -228,8 +400,19 @@ async def simulation_loop():
         start_time = asyncio.get_event_loop().time()
         action_taken_this_cycle = False
         try:
+            if not active_connections:
+                # Nobody would receive the state, so stop ticking until a client connects or the session hibernates.
+                logger.info("SIM LOOP: No subscribers. Pausing simulation.")
+                try:
+                    await asyncio.wait_for(subscribers_present.wait(), timeout=IDLE_HIBERNATE_TIMEOUT)
+                    logger.info("SIM LOOP: Subscriber connected. Resuming simulation.")
+                except asyncio.TimeoutError:
+                    async with sim_state_lock: hibernated = hibernate_session()
+                    if hibernated: logger.info("SIM LOOP: Exiting after hibernation."); break
+                continue
             async with sim_state_lock:
                 if elevator is not None:
+                    simulation_tick += 1
                     action_taken = elevator.step()
                     stopped = elevator.stopped_this_step
                     current_floor = elevator.current_floor
@@ -237,10 +420,11 @@ async def simulation_loop():
                     if stopped:
                         boarded_anyone = await handle_boarding(current_floor)
                         action_taken_this_cycle = action_taken_this_cycle or boarded_anyone
+                    if session_recorder is not None:
+                        try: session_recorder.record_state(simulation_tick, elevator, waiting_passengers)
+                        except OSError as e: logger.error(f"RECORDER: Write failed, recording stopped: {e}"); stop_recording_session()
             await broadcast_state()
-            elapsed_time = asyncio.get_event_loop().time() - start_time
-            sleep_duration = max(0.05, current_cycle_time - elapsed_time)
-            await asyncio.sleep(sleep_duration)
+            await wait_for_next_tick(start_time)
         except asyncio.CancelledError: logger.info("Simulation loop cancelled."); break
         except Exception as e: logger.error(f"SIM LOOP: Unhandled exception: {e}", exc_info=True); await asyncio.sleep(current_cycle_time if current_cycle_time > 0 else 1.0)
 
@@ -253,12 +437,11 @@ app = FastAPI(title="Elevator Simulation Backend")
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
 INDEX_HTML_PATH = os.path.join(os.path.dirname(__file__), "index.html")
 
-# *** NEW: Mount the static directory ***
-# This will serve files from ./static/ at the /static URL path
-# Make sure this is defined *before* the root path route if using root for index.html
-if os.path.exists(STATIC_DIR):
-    app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
-else:
+# Front-end assets are read from disk once and then served from memory
+# (with ETag / gzip support), so page loads and the "/" health check cost no disk I/O.
+index_cache = AssetCache(os.path.dirname(INDEX_HTML_PATH))
+static_cache = AssetCache(STATIC_DIR)
+if not os.path.exists(STATIC_DIR):
     logger.warning(f"Static directory not found at {STATIC_DIR}. Static files will not be served.")
 
 # Startup/Shutdown events remain the same
@@ -275,6 +458,7 @@ async def shutdown_event():
           except asyncio.CancelledError: logger.info("Simulation task cancelled successfully.")
           except asyncio.TimeoutError: logger.warning("Timeout waiting for simulation task cancellation.")
           except Exception as e: logger.error(f"Error stopping simulation task: {e}")
+     stop_recording_session()
 
 
 @app.websocket("/ws")
@@ -282,10 +466,10 @@ async def websocket_endpoint(websocket: WebSocket):
     """Handles WebSocket connections, configuration, and incoming messages."""
     global elevator, waiting_passengers, current_simulation_task, current_cycle_time
     global pending_decision_details, decision_received_event, user_decision_num_to_board
-    global sim_state_lock, reconfig_lock
+    global sim_state_lock, reconfig_lock, hibernated_session, applied_start_floor
 
     await websocket.accept()
-    active_connections.add(websocket)
+    add_connection(websocket)
     logger.info(f"Client connected: {websocket.client}. Total clients: {len(active_connections)}")
 
     client_configured_sim = False
@@ -301,15 +485,23 @@ async def websocket_endpoint(websocket: WebSocket):
                 async with reconfig_lock:
                     logger.info(f"Received configuration message: {message}")
                     min_f=message.get("min_floor", DEFAULT_LOWEST_FLOOR); max_f=message.get("max_floor", DEFAULT_HIGHEST_FLOOR)
-                    cap = message.get("capacity", DEFAULT_CAPACITY); start_f = message.get("start_floor", DEFAULT_START_FLOOR)
+                    cap = message.get("capacity", DEFAULT_CAPACITY); start_f = message.get("start_floor")
                     cycle_t = message.get("cycle_time", DEFAULT_CYCLE_TIME)
-                    is_valid_config = True
-                    if not (isinstance(min_f, int) and isinstance(max_f, int) and isinstance(cap, int) and cap >= 1 and isinstance(start_f, int) and isinstance(cycle_t, (int, float)) and 1.0 <= cycle_t <= 10.0): is_valid_config = False; logger.error("Invalid config types/range.")
+                    if start_f is None and isinstance(min_f, int) and isinstance(max_f, int): start_f = default_start_floor(min_f, max_f)
+                    is_valid_config = True; applied_in_place = False; restart = False
+                    if not (isinstance(min_f, int) and isinstance(max_f, int) and isinstance(cap, int) and cap >= 1 and isinstance(start_f, int) and isinstance(cycle_t, (int, float)) and 1.0 <= cycle_t <= 10.0 and isinstance(message.get("reset", False), bool)): is_valid_config = False; logger.error("Invalid config types/range.")
                     elif not (min_f <= start_f <= max_f): is_valid_config = False; logger.error("Invalid start floor.")
                     elif min_f > max_f: is_valid_config = False; logger.error("Invalid min/max floor.")
+                    elif max_f - min_f + 1 > MAX_FLOOR_SPAN: is_valid_config = False; logger.error(f"Invalid config: more than {MAX_FLOOR_SPAN} floors.")
 
-                    if is_valid_config:
-                        logger.info("Applying new configuration...");
+                    if is_valid_config: restart = restart_requested(message, start_f)
+                    if is_valid_config and not restart:
+                        async with sim_state_lock: applied_in_place = apply_hot_reconfiguration(min_f, max_f, cap, cycle_t)
+                        if applied_in_place:
+                            client_configured_sim = True
+                            await broadcast_state()
+                    if is_valid_config and not applied_in_place:
+                        logger.info("Restart requested. Applying new configuration..." if restart else "Applying new configuration...");
                         if current_simulation_task and not current_simulation_task.done():
                             logger.info("Cancelling existing simulation task for reconfig...")
                             current_simulation_task.cancel()
@@ -319,16 +511,19 @@ async def websocket_endpoint(websocket: WebSocket):
                             except Exception as e: logger.error(f"Error awaiting cancelled task: {e}")
                             current_simulation_task = None
                         async with sim_state_lock:
-                            waiting_passengers = defaultdict(lambda: defaultdict(list))
-                            current_cycle_time = cycle_t
-                            elevator = Elevator(lowest_floor=min_f, highest_floor=max_f, capacity=cap, start_floor=start_f)
-                            logger.info(f"Elevator re-initialized by {websocket.client}")
                             pending_decision_details = None; decision_received_event.clear(); user_decision_num_to_board = 0
+                            if restart: hibernated_session = None
+                            if not wake_hibernated_session(min_f, max_f, cap, cycle_t):
+                                waiting_passengers = defaultdict(lambda: defaultdict(list))
+                                current_cycle_time = cycle_t
+                                elevator = Elevator(lowest_floor=min_f, highest_floor=max_f, capacity=cap, start_floor=start_f); applied_start_floor = start_f
+                                logger.info(f"Elevator re-initialized by {websocket.client}")
+                            start_recording_session()
                         logger.info("Starting new simulation loop task...");
                         current_simulation_task = asyncio.create_task(simulation_loop())
                         client_configured_sim = True
                         await broadcast_state()
-                    else:
+                    elif not is_valid_config:
                          logger.error("Invalid config data received. Closing connection.")
                          await websocket.send_text(json.dumps({"type":"error", "message":"Invalid config data received."}))
                          await websocket.close(code=1008) # Close immediately
@@ -343,7 +538,7 @@ async def websocket_endpoint(websocket: WebSocket):
         except Exception as e: logger.error(f"Config Error: {e}", exc_info=True); await websocket.close(code=1011)
 
         if websocket.client_state != WebSocketState.CONNECTED:
-             active_connections.discard(websocket)
+             remove_connection(websocket)
              logger.info(f"Client connection closed during/after config phase.")
              return
 
@@ -367,7 +562,13 @@ async def websocket_endpoint(websocket: WebSocket):
                             elif not isinstance(num, int) or num < 1: is_valid_call = False; logger.warning(f"Invalid call: Bad num_passengers {num}")
                             elif floor == dest: is_valid_call = False; logger.warning(f"Invalid call: floor == dest ({floor})")
                             else: direction_str = 'up' if dest > floor else 'down'; call_direction_numeric = 1 if direction_str == 'up' else -1
-                            if is_valid_call and direction_str:
+                            if is_valid_call and direction_str and len(waiting_passengers.get(floor, {}).get(direction_str, [])) >= MAX_WAITING_GROUPS_PER_QUEUE:
+                                logger.warning(f"Call rejected: queue at F{floor} {direction_str} is full ({MAX_WAITING_GROUPS_PER_QUEUE} groups).")
+                                await websocket.send_text(json.dumps({"type": "error", "message": "Waiting queue for that floor is full."}))
+                            elif is_valid_call and direction_str and sum(len(groups) for dirs in waiting_passengers.values() for groups in dirs.values()) >= MAX_WAITING_GROUPS_TOTAL:
+                                logger.warning(f"Call rejected: {MAX_WAITING_GROUPS_TOTAL} waiting groups already queued across all floors.")
+                                await websocket.send_text(json.dumps({"type": "error", "message": "Too many passengers are already waiting."}))
+                            elif is_valid_call and direction_str:
                                 logger.info(f"Processing call: F{floor} to {dest} ({num}p). Inferred direction: {direction_str}")
                                 waiting_passengers[floor][direction_str].append((dest, num)); elevator.add_external_request(floor, call_direction_numeric); logger.info("Call registered by backend.")
                             else: logger.warning(f"Invalid call message received or could not infer direction: {message}"); await websocket.send_text(json.dumps({"type": "error", "message": "Invalid call data received."}))
@@ -378,19 +579,29 @@ async def websocket_endpoint(websocket: WebSocket):
                              floor = message.get("floor"); direction = message.get("direction"); logger.info(f"Received ping for floor {floor} direction {direction}")
                              if isinstance(floor, int) and elevator._is_valid_floor(floor) and direction in ['up', 'down']: ping_direction_numeric = 1 if direction == 'up' else -1; elevator.add_external_request(floor, ping_direction_numeric)
                              else: logger.warning(f"Invalid ping data: {message}")
+                elif msg_type == "history":
+                    history = await get_history(message)
+                    await websocket.send_text(json.dumps(history))
                 elif msg_type == "configure": should_reconfig = True; logger.info("Received re-configure request.")
                 else: logger.warning(f"Unknown message type received: {msg_type}")
 
                 if should_reconfig:
                     async with reconfig_lock:
                          logger.info(f"Handling RE-configuration message from {websocket.client}: {message}")
-                         min_f=message.get("min_floor", elevator.lowest_floor if elevator else DEFAULT_LOWEST_FLOOR); max_f=message.get("max_floor", elevator.highest_floor if elevator else DEFAULT_HIGHEST_FLOOR); cap = message.get("capacity", elevator.capacity if elevator else DEFAULT_CAPACITY); start_f = message.get("start_floor", DEFAULT_START_FLOOR); cycle_t = message.get("cycle_time", current_cycle_time)
-                         is_valid_reconfig = True
-                         if not (isinstance(min_f, int) and isinstance(max_f, int) and isinstance(cap, int) and cap >= 1 and isinstance(start_f, int) and isinstance(cycle_t, (int, float)) and 1.0 <= cycle_t <= 10.0): is_valid_reconfig = False; logger.error("Invalid re-config types/range.")
+                         min_f=message.get("min_floor", elevator.lowest_floor if elevator else DEFAULT_LOWEST_FLOOR); max_f=message.get("max_floor", elevator.highest_floor if elevator else DEFAULT_HIGHEST_FLOOR); cap = message.get("capacity", elevator.capacity if elevator else DEFAULT_CAPACITY); start_f = message.get("start_floor"); cycle_t = message.get("cycle_time", current_cycle_time)
+                         if start_f is None and isinstance(min_f, int) and isinstance(max_f, int): start_f = default_start_floor(min_f, max_f)
+                         is_valid_reconfig = True; restart = False
+                         if not (isinstance(min_f, int) and isinstance(max_f, int) and isinstance(cap, int) and cap >= 1 and isinstance(start_f, int) and isinstance(cycle_t, (int, float)) and 1.0 <= cycle_t <= 10.0 and isinstance(message.get("reset", False), bool)): is_valid_reconfig = False; logger.error("Invalid re-config types/range.")
                          elif not (min_f <= start_f <= max_f): is_valid_reconfig = False; logger.error("Invalid re-config start floor.")
                          elif min_f > max_f: is_valid_reconfig = False; logger.error("Invalid re-config min/max floor.")
-                         if is_valid_reconfig:
-                            logger.info("Applying re-configuration...");
+                         elif max_f - min_f + 1 > MAX_FLOOR_SPAN: is_valid_reconfig = False; logger.error(f"Invalid re-config: more than {MAX_FLOOR_SPAN} floors.")
+                         applied_in_place = False
+                         if is_valid_reconfig: restart = restart_requested(message, start_f)
+                         if is_valid_reconfig and not restart:
+                            async with sim_state_lock: applied_in_place = apply_hot_reconfiguration(min_f, max_f, cap, cycle_t)
+                            if applied_in_place: await broadcast_state()
+                         if is_valid_reconfig and not applied_in_place:
+                            logger.info("Restart requested. Applying re-configuration..." if restart else "Applying re-configuration...");
                             if current_simulation_task and not current_simulation_task.done():
                                 current_simulation_task.cancel(); await asyncio.sleep(0.1)
                                 try: await current_simulation_task
@@ -398,12 +609,14 @@ async def websocket_endpoint(websocket: WebSocket):
                                 except Exception as e: logger.error(f"Error awaiting cancelled task: {e}")
                                 current_simulation_task = None
                             async with sim_state_lock:
+                                hibernated_session = None
                                 waiting_passengers = defaultdict(lambda: defaultdict(list)); current_cycle_time = cycle_t
-                                elevator = Elevator(lowest_floor=min_f, highest_floor=max_f, capacity=cap, start_floor=start_f)
+                                elevator = Elevator(lowest_floor=min_f, highest_floor=max_f, capacity=cap, start_floor=start_f); applied_start_floor = start_f
                                 logger.info(f"Elevator re-initialized by {websocket.client}"); pending_decision_details = None; decision_received_event.clear(); user_decision_num_to_board = 0
+                                start_recording_session()
                             logger.info("Starting new simulation loop task..."); current_simulation_task = asyncio.create_task(simulation_loop())
                             await broadcast_state()
-                         else: logger.error("Invalid re-configuration data received."); await websocket.send_text(json.dumps({"type":"error", "message":"Invalid re-config data received."}))
+                         elif not is_valid_reconfig: logger.error("Invalid re-configuration data received."); await websocket.send_text(json.dumps({"type":"error", "message":"Invalid re-config data received."}))
 
             except json.JSONDecodeError: logger.warning("Received invalid JSON.")
             except WebSocketDisconnect: logger.info(f"Client disconnected during message loop: {websocket.client}"); break
@@ -411,17 +624,25 @@ async def websocket_endpoint(websocket: WebSocket):
 
     except WebSocketDisconnect: logger.info(f"Client disconnected: {websocket.client}")
     except Exception as e: logger.error(f"WS Handler Error for {websocket.client}: {e}", exc_info=True); await websocket.close(code=1011)
-    finally: active_connections.discard(websocket); logger.info(f"Client connection closed/removed. Total clients: {len(active_connections)}")
+    finally: remove_connection(websocket); logger.info(f"Client connection closed/removed. Total clients: {len(active_connections)}")
 
 
-# *** NEW: Route to serve index.html ***
-@app.get("/", response_class=HTMLResponse)
-async def read_index():
-    if not os.path.exists(INDEX_HTML_PATH):
+# Route to serve index.html (also used as the Render health check path)
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
+async def read_index(request: Request):
+    asset = index_cache.get(os.path.basename(INDEX_HTML_PATH))
+    if asset is None:
         logger.error(f"index.html not found at {INDEX_HTML_PATH}")
         return HTMLResponse(content="<html><body><h1>Index file not found</h1></body></html>", status_code=500)
-    with open(INDEX_HTML_PATH) as f:
-        return HTMLResponse(content=f.read(), status_code=200)
+    return asset.response(request)
+
+# Route to serve ./static/ files at the /static URL path from the in-memory cache
+@app.api_route("/static/{file_path:path}", methods=["GET", "HEAD"])
+async def read_static(file_path: str, request: Request):
+    asset = static_cache.get(file_path)
+    if asset is None:
+        return Response(content="Not Found", status_code=404, media_type="text/plain")
+    return asset.response(request)
 
 # --- Run Instructions ---
 # uvicorn main:app --reload --port 5050 # For local dev
@@ -0,0 +1,332 @@
+# recorder.py
+# Optional time-series recorder for simulation sessions.
+# Each tick's car floor/direction/load and queue lengths are appended to
+# array-backed columns. Every CHUNK_SIZE ticks the columns are sealed into a
+# zlib-compressed chunk file on local disk, so memory stays bounded no matter
+# how long the session runs. The unsealed tail is also rewritten to a tail file
+# every FLUSH_INTERVAL seconds, so a crash loses at most that much history.
+# meta.json records the session's configuration and any live changes to it.
+# Range reads and downsampled playback are served from the chunk files plus the in-memory tail.
+
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (column name, array typecode)
+COLUMNS: List[Tuple[str, str]] = [
+    ("tick", "q"),
+    ("timestamp", "d"),
+    ("floor", "i"),
+    ("direction", "b"),
+    ("load", "i"),
+    ("waiting_up", "i"),
+    ("waiting_down", "i"),
+]
+CHUNK_SIZE = 1024          # Rows per sealed chunk
+MAX_CACHED_CHUNKS = 4      # Decoded chunks kept in memory for repeated queries
+DEFAULT_MAX_CHUNKS = 2048  # Sealed chunks kept on disk (~2M ticks); oldest are deleted first
+CHUNK_MAGIC = b"ELVREC1\n"
+CHUNK_FILE_PREFIX = "chunk_"
+CHUNK_FILE_SUFFIX = ".bin"
+SESSION_DIR_PREFIX = "session_"
+TAIL_FILE_NAME = "tail.bin" # Latest unsealed rows, rewritten every FLUSH_INTERVAL seconds
+META_FILE_NAME = "meta.json"
+FLUSH_INTERVAL = 30.0      # Seconds between tail flushes
+CLOSED_MARKER_NAME = "closed" # Written by close(); only closed sessions are pruned
+STALE_SESSION_AGE = 6 * 3600.0 # Unclosed sessions untouched this long were abandoned (e.g. a crashed worker)
+
+
+def _new_columns() -> Dict[str, array]:
+    return {name: array(typecode) for name, typecode in COLUMNS}
+
+
+def write_chunk(path: str, columns: Dict[str, array]):
+    """ Writes one chunk file: magic, header length, JSON header, then one compressed blob per column. """
+    blobs = [zlib.compress(columns[name].tobytes(), 6) for name, _ in COLUMNS]
+    header = json.dumps({
+        "rows": len(columns["tick"]),
+        "columns": [[name, typecode, len(blob)] for (name, typecode), blob in zip(COLUMNS, blobs)],
+    }).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(CHUNK_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for blob in blobs: f.write(blob)
+    os.replace(tmp_path, path) # Never leave a half-written chunk behind
+
+
+def read_chunk(path: str) -> Dict[str, array]:
+    """ Reads a chunk file written by write_chunk back into columns. """
+    with open(path, "rb") as f:
+        if f.read(len(CHUNK_MAGIC)) != CHUNK_MAGIC:
+            raise ValueError(f"Not a recording chunk: {path}")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+        columns = {}
+        for name, typecode, blob_len in header["columns"]:
+            col = array(typecode)
+            col.frombytes(zlib.decompress(f.read(blob_len)))
+            columns[name] = col
+    return columns
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f: json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try: total += os.path.getsize(os.path.join(path, name))
+        except OSError: pass
+    return total
+
+
+def _is_prunable(path: str, now: float, stale_after: Optional[float]) -> bool:
+    """ A session may be deleted once it was closed cleanly, or when it has been abandoned for stale_after seconds. """
+    if os.path.exists(os.path.join(path, CLOSED_MARKER_NAME)): return True
+    # A live recorder rewrites its tail every FLUSH_INTERVAL, which keeps the directory's mtime fresh.
+    return stale_after is not None and now - os.path.getmtime(path) > stale_after
+
+
+def prune_sessions(root_dir: str, keep_dir: Optional[str], max_sessions: Optional[int], max_bytes: Optional[int],
+                   stale_after: Optional[float] = STALE_SESSION_AGE) -> int:
+    """
+    Deletes the oldest session directories under root_dir (by modification time) until at most
+    max_sessions remain and their total size is within max_bytes. keep_dir is never deleted, and neither
+    is any session that is still being recorded (e.g. by another worker process): only sessions that were
+    closed, or abandoned for stale_after seconds, are removed. Returns the number of directories removed.
+    """
+    if not os.path.isdir(root_dir): return 0
+    sessions = []
+    now = time.time()
+    for name in os.listdir(root_dir):
+        path = os.path.join(root_dir, name)
+        if not name.startswith(SESSION_DIR_PREFIX) or not os.path.isdir(path): continue
+        try: sessions.append((os.path.getmtime(path), path, _dir_size(path), _is_prunable(path, now, stale_after)))
+        except OSError: continue
+    sessions.sort() # Oldest first
+    total_bytes = sum(size for _, _, size, _ in sessions)
+    removed = 0
+    for _, path, size, prunable in sessions:
+        over_count = max_sessions is not None and len(sessions) - removed > max_sessions
+        over_bytes = max_bytes is not None and total_bytes > max_bytes
+        if not (over_count or over_bytes): break
+        if not prunable: continue
+        if keep_dir is not None and os.path.realpath(path) == os.path.realpath(keep_dir): continue
+        try: shutil.rmtree(path)
+        except OSError as e: logger.warning(f"RECORDER: Could not remove old session {path}: {e}"); continue
+        removed += 1; total_bytes -= size
+    return removed
+
+
+class SessionRecorder:
+    """
+    Records one simulation session into a directory of compressed column chunks.
+    - append() adds a row per tick, numbered by the simulation's own tick counter (the "tick"
+      broadcast to clients), so live ticks can be used directly in queries. A full chunk is sealed
+      and written immediately.
+    - query() returns a (optionally downsampled) tick range as plain lists.
+    - The unsealed tail is written to tail.bin at most every flush_interval seconds.
+    - meta.json holds the starting configuration (meta) and config changes (record_config_change()).
+    - close() flushes the partial tail chunk.
+    Only the active chunk, a small per-chunk index and a few decoded chunks are held in memory.
+    query() is safe to run in a worker thread: the internal lock is held only to snapshot the
+    index and tail, and chunk files are decoded outside it so appends are never blocked.
+    At most max_chunks sealed chunks are retained; older history is dropped (None disables the cap).
+    """
+
+    def __init__(self, directory: str, chunk_size: int = CHUNK_SIZE, max_chunks: Optional[int] = DEFAULT_MAX_CHUNKS,
+                 flush_interval: Optional[float] = FLUSH_INTERVAL, meta: Optional[Dict[str, Any]] = None):
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError("Chunk size must be a positive integer.")
+        if max_chunks is not None and (not isinstance(max_chunks, int) or max_chunks < 1):
+            raise ValueError("Max chunks must be a positive integer or None.")
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        os.makedirs(directory, exist_ok=True)
+        self._active = _new_columns()
+        # Index of sealed chunks: (first_tick, last_tick, path)
+        self._chunk_index: List[Tuple[int, int, str]] = []
+        self._decoded_cache: "OrderedDict[str, Dict[str, array]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.next_tick = 0 # One past the newest recorded tick
+        self.rows = 0
+        self.closed = False
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self.meta: Dict[str, Any] = {"created_at": time.time(), "config": dict(meta or {}), "config_changes": []}
+        _write_json(os.path.join(directory, META_FILE_NAME), self.meta)
+
+    @classmethod
+    def open(cls, directory: str) -> "SessionRecorder":
+        """ Opens a finished (or in-progress) recording for read-only analysis. """
+        recorder = cls.__new__(cls)
+        recorder.directory = directory
+        recorder.chunk_size = CHUNK_SIZE
+        recorder.max_chunks = None
+        recorder._active = _new_columns()
+        recorder._chunk_index = []
+        recorder._decoded_cache = OrderedDict()
+        recorder._lock = threading.Lock()
+        recorder.rows = 0
+        recorder.closed = True
+        recorder.flush_interval = None
+        meta_path = os.path.join(directory, META_FILE_NAME)
+        recorder.meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f: recorder.meta = json.load(f)
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith(CHUNK_FILE_PREFIX) and name.endswith(CHUNK_FILE_SUFFIX)): continue
+            path = os.path.join(directory, name)
+            ticks = read_chunk(path)["tick"]
+            if ticks: recorder._chunk_index.append((ticks[0], ticks[-1], path))
+            recorder.rows += len(ticks)
+        recorder.next_tick = recorder._chunk_index[-1][1] + 1 if recorder._chunk_index else 0
+        # A session that did not close cleanly keeps its last flushed tail in tail.bin.
+        tail_path = os.path.join(directory, TAIL_FILE_NAME)
+        if os.path.exists(tail_path):
+            tail = read_chunk(tail_path)
+            keep_from = bisect_left(tail["tick"], recorder.next_tick) # Skip rows already sealed before a crash
+            recorder._active = {name: tail[name][keep_from:] for name, _ in COLUMNS}
+            if recorder._active["tick"]:
+                recorder.rows += len(recorder._active["tick"])
+                recorder.next_tick = recorder._active["tick"][-1] + 1
+        return recorder
+
+    @property
+    def total_rows(self) -> int:
+        return self.rows
+
+    @property
+    def first_tick(self) -> int:
+        """ Oldest tick still available (earlier ticks may have been dropped by the max_chunks cap). """
+        if self._chunk_index: return self._chunk_index[0][0]
+        return self._active["tick"][0] if self._active["tick"] else self.next_tick
+
+    def append(self, tick: int, floor: int, direction: int, load: int, waiting_up: int, waiting_down: int, timestamp: Optional[float] = None) -> int:
+        """ Appends one tick. Ticks must be strictly increasing but may have gaps. Returns the tick. """
+        if self.closed: raise RuntimeError("Recorder is closed.")
+        with self._lock:
+            if tick < self.next_tick: raise ValueError(f"Tick {tick} is not after the last recorded tick ({self.next_tick - 1}).")
+            row = (tick, time.time() if timestamp is None else timestamp, floor, direction, load, waiting_up, waiting_down)
+            for (name, _), value in zip(COLUMNS, row):
+                self._active[name].append(value)
+            self.next_tick = tick + 1; self.rows += 1
+            if len(self._active["tick"]) >= self.chunk_size:
+                self._seal_active()
+            elif self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_tail()
+        return tick
+
+    def record_config_change(self, tick: int, config: Dict[str, Any]):
+        """ Appends a live configuration change (e.g. a new floor range or cycle time) to meta.json. """
+        if self.closed: raise RuntimeError("Recorder is closed.")
+        with self._lock:
+            self.meta["config_changes"].append({"tick": tick, "time": time.time(), "config": dict(config)})
+            _write_json(os.path.join(self.directory, META_FILE_NAME), self.meta)
+
+    def record_state(self, tick: int, elevator, waiting_passengers) -> int:
+        """ Appends the current car state and queue lengths (summed passengers per direction) for a simulation tick. """
+        waiting_up = sum(n for dirs in waiting_passengers.values() for _, n in dirs.get('up', ()))
+        waiting_down = sum(n for dirs in waiting_passengers.values() for _, n in dirs.get('down', ()))
+        return self.append(tick, elevator.current_floor, elevator.direction, elevator.current_load, waiting_up, waiting_down)
+
+    def _seal_active(self):
+        ticks = self._active["tick"]
+        if not ticks: return
+        path = os.path.join(self.directory, f"{CHUNK_FILE_PREFIX}{ticks[0]:010d}{CHUNK_FILE_SUFFIX}")
+        write_chunk(path, self._active)
+        self._chunk_index.append((ticks[0], ticks[-1], path))
+        self._active = _new_columns()
+        self._last_flush = time.monotonic()
+        try: os.remove(os.path.join(self.directory, TAIL_FILE_NAME)) # Its rows are now in the sealed chunk
+        except FileNotFoundError: pass
+        while self.max_chunks is not None and len(self._chunk_index) > self.max_chunks:
+            _, _, oldest_path = self._chunk_index.pop(0)
+            self._decoded_cache.pop(oldest_path, None)
+            try: os.remove(oldest_path)
+            except OSError as e: logger.warning(f"RECORDER: Could not remove old chunk {oldest_path}: {e}")
+
+    def _flush_tail(self):
+        """ Rewrites tail.bin with the unsealed rows so they survive a crash. Assumes the lock is held. """
+        write_chunk(os.path.join(self.directory, TAIL_FILE_NAME), self._active)
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """ Writes the partial tail chunk to disk. Later appends start a new chunk. """
+        with self._lock: self._seal_active()
+
+    def close(self):
+        if self.closed: return
+        try:
+            self.flush()
+            with open(os.path.join(self.directory, CLOSED_MARKER_NAME), "w") as f: f.write(f"{time.time()}\n")
+        except OSError as e: logger.error(f"RECORDER: Failed to flush {self.directory}: {e}")
+        self.closed = True
+
+    def _load_chunk(self, path: str) -> Optional[Dict[str, array]]:
+        """ Returns a decoded chunk, or None if it was deleted by the max_chunks cap meanwhile. """
+        with self._lock:
+            cached = self._decoded_cache.get(path)
+            if cached is not None:
+                self._decoded_cache.move_to_end(path)
+                return cached
+        try: columns = read_chunk(path) # Decoded without holding the lock
+        except FileNotFoundError: return None
+        with self._lock:
+            self._decoded_cache[path] = columns
+            while len(self._decoded_cache) > MAX_CACHED_CHUNKS:
+                self._decoded_cache.popitem(last=False)
+        return columns
+
+    def query(self, start_tick: int = 0, end_tick: Optional[int] = None, max_points: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Returns rows with start_tick <= tick < end_tick as a dict of column lists.
+        If max_points is given, the range is downsampled by taking every n-th recorded row.
+        """
+        with self._lock:
+            if end_tick is None or end_tick > self.next_tick: end_tick = self.next_tick
+            start_tick = max(self.first_tick, start_tick)
+            sources = [(first, last, path) for first, last, path in self._chunk_index if last >= start_tick and first < end_tick]
+            active_ticks = self._active["tick"]
+            active = None
+            if active_ticks and active_ticks[-1] >= start_tick and active_ticks[0] < end_tick:
+                active = {name: array(col.typecode, col) for name, col in self._active.items()} # At most chunk_size rows
+        step = 1
+        if max_points is not None and max_points > 0 and end_tick > start_tick:
+            step = max(1, -(-(end_tick - start_tick) // max_points))
+        result: Dict[str, List] = {name: [] for name, _ in COLUMNS}
+        skip = 0 # Rows to skip before the next sample, carried across chunks to keep the stride even
+        for first, last, path in sources:
+            columns = self._load_chunk(path)
+            if columns is not None: skip = self._extend_range(result, columns, start_tick, end_tick, step, skip)
+        if active is not None:
+            self._extend_range(result, active, start_tick, end_tick, step, skip)
+        return {"start_tick": start_tick, "end_tick": end_tick, "step": step, "columns": result}
+
+    @staticmethod
+    def _extend_range(result: Dict[str, List], columns: Dict[str, array], start_tick: int, end_tick: int, step: int, skip: int) -> int:
+        """ Appends every step-th row with start_tick <= tick < end_tick. Returns the skip for the next chunk. """
+        ticks = columns["tick"]
+        lo_idx = bisect_left(ticks, start_tick) + skip
+        hi_idx = bisect_left(ticks, end_tick)
+        if lo_idx >= hi_idx: return lo_idx - hi_idx
+        for name, _ in COLUMNS:
+            result[name].extend(columns[name][lo_idx:hi_idx:step])
+        return (lo_idx - hi_idx) % step
@@ -934,13 +934,10 @@ document.addEventListener('DOMContentLoaded', () => {
                      // Recreate the building visualization
                      createBuildingUI();
                  } else {
-                     // If connected, inform user they need to reconnect for changes to take full effect
-                     // (because initial config is sent only on connection)
-                     alert("Configuration changes require reconnecting to the simulation server to take full effect.");
-                     // Optionally, you could implement a "reconfigure" message type
-                     // if the backend supports live reconfiguration.
-                     // const reconfigMsg = { type: "reconfigure", ...config };
-                     // websocket.send(JSON.stringify(reconfigMsg));
+                     // If connected, inform user the config is only sent on (re)connect.
+                     // The server applies it to the running simulation in place, keeping the car and
+                     // waiting passengers; a different start floor (or "reset": true) starts a fresh run.
+                     alert("Reconnect to apply the new configuration. Top floor, capacity and cycle time changes are applied to the running simulation, keeping the car and waiting passengers. Changing the lowest floor (the start floor) starts a fresh run.");
                  }
             } else {
                  // This case should be less likely with sliders and fixed ranges
@@ -0,0 +1,5 @@
+# Makes the top-level modules (recorder.py, asset_cache.py, ...) importable from the tests.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
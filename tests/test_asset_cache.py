@@ -0,0 +1,38 @@
+import pytest
+from starlette.requests import Request
+
+from asset_cache import CachedAsset, accepts_gzip
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("GZIP;q=0.5", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.0, deflate", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("br, *;q=0.5", True),
+    ("gzip;q=0, *", False),
+    ("identity", False),
+    ("", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def _request(headers):
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+
+def test_each_content_coding_has_its_own_etag():
+    asset = CachedAsset("index.html", b"<html>" + b"x" * 4096 + b"</html>", "text/html")
+    gzipped = asset.response(_request({"Accept-Encoding": "gzip"}))
+    plain = asset.response(_request({"Accept-Encoding": "gzip;q=0"}))
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert gzipped.headers["etag"] != plain.headers["etag"]
+    # A validator only matches the coding it was issued for
+    assert asset.response(_request({"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]})).status_code == 304
+    assert asset.response(_request({"If-None-Match": gzipped.headers["etag"]})).status_code == 200
+    assert asset.response(_request({"If-None-Match": "W/" + plain.headers["etag"]})).status_code == 304
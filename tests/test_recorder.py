@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+from recorder import SessionRecorder, META_FILE_NAME, TAIL_FILE_NAME, CHUNK_FILE_PREFIX
+
+
+def _fill(recorder, ticks):
+    for t in ticks:
+        recorder.append(t, t % 7, 1, t % 5, 0, 0, timestamp=float(t))
+
+
+def _chunk_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith(CHUNK_FILE_PREFIX))
+
+
+def test_query_with_tick_gaps_across_chunks(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), chunk_size=100)
+    ticks = [t for t in range(50, 1300) if t % 13]
+    _fill(recorder, ticks)
+    assert recorder.query()["columns"]["tick"] == ticks
+    assert recorder.query(300, 700)["columns"]["tick"] == [t for t in ticks if 300 <= t < 700]
+    # Bounds falling inside a gap
+    assert recorder.query(65, 79)["columns"]["tick"] == [t for t in ticks if 65 <= t < 79]
+
+
+def test_downsampling_keeps_an_even_stride_across_chunks(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), chunk_size=100)
+    ticks = [t for t in range(50, 1300) if t % 13]
+    _fill(recorder, ticks)
+    result = recorder.query(95, 905, max_points=7)
+    expected = [t for t in ticks if 95 <= t < 905][::result["step"]]
+    assert result["columns"]["tick"] == expected
+    assert len(result["columns"]["tick"]) <= 7
+    # Every column is sampled at the same rows
+    assert result["columns"]["floor"] == [t % 7 for t in expected]
+
+
+def test_max_chunks_prunes_oldest_history(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), chunk_size=100, max_chunks=3)
+    _fill(recorder, range(1000, 1650))
+    assert len(_chunk_files(tmp_path)) == 3
+    assert recorder.first_tick == 1300
+    result = recorder.query(0)
+    assert result["start_tick"] == 1300
+    assert result["columns"]["tick"] == list(range(1300, 1650))
+
+
+def test_append_rejects_ticks_that_go_backwards(tmp_path):
+    recorder = SessionRecorder(str(tmp_path))
+    recorder.append(10, 0, 0, 0, 0, 0)
+    with pytest.raises(ValueError):
+        recorder.append(10, 0, 0, 0, 0, 0)
+
+
+def test_open_reads_back_a_closed_recording(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), chunk_size=100, meta={"lowest_floor": -1, "highest_floor": 5})
+    _fill(recorder, range(250))
+    recorder.record_config_change(120, {"lowest_floor": 0, "highest_floor": 5})
+    recorder.close()
+    reopened = SessionRecorder.open(str(tmp_path))
+    assert reopened.total_rows == 250
+    assert reopened.query(240)["columns"]["tick"] == list(range(240, 250))
+    assert reopened.meta["config"] == {"lowest_floor": -1, "highest_floor": 5}
+    assert [change["tick"] for change in reopened.meta["config_changes"]] == [120]
+
+
+def test_tail_is_flushed_on_interval_and_recovered_after_a_crash(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), chunk_size=100, flush_interval=0.0)
+    _fill(recorder, range(130))
+    assert os.path.exists(tmp_path / TAIL_FILE_NAME)
+    # No close(): simulate a crash and recover from disk alone
+    reopened = SessionRecorder.open(str(tmp_path))
+    assert reopened.query()["columns"]["tick"] == list(range(130))
+
+
+def test_sealing_a_chunk_removes_the_tail_file(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), chunk_size=10, flush_interval=0.0)
+    _fill(recorder, range(10))
+    assert not os.path.exists(tmp_path / TAIL_FILE_NAME)
+    with open(tmp_path / META_FILE_NAME) as f:
+        assert json.load(f)["config_changes"] == []
+
+
+def _make_session(root, name, mtime, closed):
+    path = root / name
+    recorder = SessionRecorder(str(path), flush_interval=None)
+    _fill(recorder, range(5))
+    if closed: recorder.close()
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_sessions_only_removes_closed_or_abandoned_sessions(tmp_path):
+    import time
+    from recorder import prune_sessions, STALE_SESSION_AGE
+    now = time.time()
+    closed_old = _make_session(tmp_path, "session_a", now - 300, closed=True)
+    live_other_worker = _make_session(tmp_path, "session_b", now - 200, closed=False)
+    abandoned = _make_session(tmp_path, "session_c", now - STALE_SESSION_AGE - 60, closed=False)
+    current = _make_session(tmp_path, "session_d", now - 100, closed=False)
+    removed = prune_sessions(str(tmp_path), str(current), max_sessions=1, max_bytes=None)
+    assert removed == 2
+    assert not closed_old.exists() and not abandoned.exists()
+    assert live_other_worker.exists() and current.exists()